@@ -1,63 +1,343 @@
 import os
 import csv
+import asyncio
+import functools
+import hashlib
+import itertools
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import openai
 import dotenv
-import json
+import orjson
+import jiter
 import google.cloud.texttospeech as tts
+from google.api_core import exceptions as google_exceptions
+from tenacity import AsyncRetrying, before_sleep_log, retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 import argparse
+import logging
 
 dotenv.load_dotenv()
 
-TTS_CLIENT = tts.TextToSpeechClient()
-
-def synthesize_audio(text, filename):
-    synthesis_input = tts.SynthesisInput(text=text)
-    voice = tts.VoiceSelectionParams(
-        language_code="cmn-CN",
-        name="cmn-CN-Chirp3-HD-Achernar"
-    )
-    audio_config = tts.AudioConfig(audio_encoding=tts.AudioEncoding.MP3)
-    response = TTS_CLIENT.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
-
-    with open(filename, "wb") as out:
-        out.write(response.audio_content)
-
-
-def generate_fields_from_hanzi(hanzi):
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    prompt = f"""
-You are a Mandarin language assistant. For the word: {hanzi}, provide the following:
+log = logging.getLogger("hanzi")
+
+# API clients are created once and shared by every request so they reuse
+# their pooled, kept-alive connections. Don't construct them per call.
+# Retries are handled by retry_transient below rather than by the client.
+OPENAI_CLIENT = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+# Default number of requests in flight to each provider; see --openai-concurrency
+# and --tts-concurrency.
+OPENAI_CONCURRENCY = 4
+TTS_CONCURRENCY = 8
+# How long a slot is taken out of circulation after a rate limit response.
+RATE_LIMIT_COOLDOWN = 60
+
+# Words sent to OpenAI in a single request.
+BATCH_SIZE = 16
+
+MODEL = "gpt-4o-mini"
+# Bump when the prompts change so cached fields from older prompts are ignored.
+PROMPT_VERSION = "v2"
+CACHE_FILE = "output/.cache.sqlite"
+# Every call on the sqlite connection, from opening to closing, runs on this
+# one thread so cache reads and commits never block the event loop.
+CACHE_IO = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-io")
+
+VOICE_NAME = "cmn-CN-Chirp3-HD-Achernar"
+AUDIO_DIR = "output/audio"
+# Synthesized MP3s keyed by a hash of (voice, text); files in AUDIO_DIR are
+# links to these so repeated text is only sent to TTS once.
+AUDIO_CACHE_DIR = "output/audio/cache"
+# Dedicated threads for audio file writes so they never block the event loop
+# or compete with the default executor.
+AUDIO_IO = ThreadPoolExecutor(max_workers=4, thread_name_prefix="audio-io")
+
+# Request parameters that are the same for every call, built once.
+VOICE = tts.VoiceSelectionParams(language_code="cmn-CN", name=VOICE_NAME)
+AUDIO_CONFIG = tts.AudioConfig(audio_encoding=tts.AudioEncoding.MP3)
+
+# The instructions are sent as an identical system message on every call and
+# only the short user message changes, so the provider can reuse the cached
+# prompt prefix.
+WORD_SYSTEM_PROMPT = """
+You are a Mandarin language assistant. The user will send a single Mandarin word. For that word, provide the following:
 1. English meaning
 2. Pinyin
 3. Example sentence using the word
 4. English translation of the sentence
-5. Sentence with the word replaced by a blank (cloze format). Make sure the cloze deletion has low ambiguity and the missing word is clearly {hanzi}, not another word.
+5. Sentence with the word replaced by a blank (cloze format). Make sure the cloze deletion has low ambiguity and the missing word is clearly the user's word, not another word.
 
 Respond in JSON like this:
-{{
+{
   "english": "...",
   "pinyin": "...",
   "sentence": "...",
   "translation": "...",
   "cloze": "..."
-}}
+}
+"""
+
+BATCH_SYSTEM_PROMPT = """
+You are a Mandarin language assistant. The user will send a JSON list of Mandarin words. For each word in the list, provide the following:
+1. English meaning
+2. Pinyin
+3. Example sentence using the word
+4. English translation of the sentence
+5. Sentence with the word replaced by a blank (cloze format). Make sure the cloze deletion has low ambiguity and the missing word is clearly that word, not another word.
+
+Respond in JSON like this, with one item per word in the same order as the list:
+{
+  "items": [
+    {
+      "word": "...",
+      "english": "...",
+      "pinyin": "...",
+      "sentence": "...",
+      "translation": "...",
+      "cloze": "..."
+    }
+  ]
+}
+"""
+
+
+class StreamFailedError(Exception):
+    """OpenAI reported a server-side failure partway through a streamed response."""
+
+
+# Errors worth retrying in-flight; anything else fails the word straight away.
+# The openai SDK only wraps transport errors raised while sending a request;
+# a connection dropped while a streamed body is being read raises the raw
+# httpx error.
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    httpx.TransportError,
+    StreamFailedError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+
+RETRY_POLICY = dict(
+    stop=stop_after_attempt(5),
+    wait=wait_random_exponential(min=1, max=30),
+    retry=retry_if_exception_type(TRANSIENT_ERRORS),
+    before_sleep=before_sleep_log(log, logging.WARNING),
+    reraise=True,
+)
+retry_transient = retry(**RETRY_POLICY)
+
+RATE_LIMIT_ERRORS = (
+    openai.RateLimitError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+)
+
+
+class AdaptiveLimit:
+    """Bounds the requests in flight to one provider, backing off on 429s.
+
+    Used as ``async with limit:`` around a single request attempt. When an
+    attempt is rate limited, one slot is taken out of circulation for
+    RATE_LIMIT_COOLDOWN seconds, down to a minimum of one.
     """
 
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=[
-            {"role": "user", "content": prompt},
-        ],
-        text={"format": {"type": "json_object"}}
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._sem = asyncio.Semaphore(limit)
+        self._held = 0
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if isinstance(exc, RATE_LIMIT_ERRORS) and self._held < self.limit - 1:
+            # Keep the slot instead of releasing it: re-acquiring it later
+            # would queue behind every waiting request, so capacity would
+            # only drop once the backlog had already gone out.
+            self._held += 1
+            asyncio.get_running_loop().call_later(RATE_LIMIT_COOLDOWN, self._restore_slot)
+            log.warning("%s rate limited, reducing concurrency to %d for %ds",
+                        self.name, self.limit - self._held, RATE_LIMIT_COOLDOWN)
+        else:
+            self._sem.release()
+
+    def _restore_slot(self):
+        self._held -= 1
+        self._sem.release()
+
+
+@functools.cache
+def tts_client():
+    # Shared like OPENAI_CLIENT, but grpc.aio channels bind to the event loop
+    # they are created on, so it is built lazily from inside asyncio.run().
+    return tts.TextToSpeechAsyncClient()
+
+
+@retry_transient
+async def synthesize_audio(text, tts_limit):
+    log.debug("TTS: %s", text)
+    synthesis_input = tts.SynthesisInput(text=text)
+    async with tts_limit:
+        response = await tts_client().synthesize_speech(input=synthesis_input, voice=VOICE, audio_config=AUDIO_CONFIG)
+    return response.audio_content
+
+
+def save_audio(audio_content, cache_path):
+    # Write then rename so an interrupted write never looks like a hit. The
+    # temp name is unique because the same text can be saved concurrently.
+    with tempfile.NamedTemporaryFile(dir=AUDIO_CACHE_DIR, suffix=".part", delete=False) as out:
+        out.write(audio_content)
+    try:
+        os.replace(out.name, cache_path)
+    except OSError:
+        os.remove(out.name)
+        raise
+
+
+def audio_paths(hanzi):
+    """Return the (word, sentence) audio filenames the notes for ``hanzi`` use."""
+    return (
+        os.path.join(AUDIO_DIR, f"{hanzi}_word.mp3"),
+        os.path.join(AUDIO_DIR, f"{hanzi}_sentence.mp3"),
     )
 
+
+async def synthesize_to_file(text, filename, tts_limit):
+    """Save the audio for ``text`` to ``filename``, only calling TTS if this
+    text hasn't been synthesized with the current voice before.
+
+    ``tts_limit`` is the AdaptiveLimit for TTS requests.
+    """
+    digest = hashlib.sha1(f"{VOICE_NAME}|{text}".encode()).hexdigest()
+    cache_path = os.path.join(AUDIO_CACHE_DIR, f"{digest}.mp3")
+    loop = asyncio.get_running_loop()
+    if os.path.exists(cache_path):
+        log.debug("Audio cache hit: %s", text)
+    else:
+        audio_content = await synthesize_audio(text, tts_limit)
+        await loop.run_in_executor(AUDIO_IO, save_audio, audio_content, cache_path)
+    await loop.run_in_executor(AUDIO_IO, link_audio, cache_path, filename)
+
+
+def link_audio(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+@retry_transient
+async def generate_fields_from_hanzi(hanzi, openai_limit):
+    async with openai_limit:
+        response = await OPENAI_CLIENT.responses.create(
+            model=MODEL,
+            input=[
+                {"role": "system", "content": WORD_SYSTEM_PROMPT},
+                {"role": "user", "content": hanzi},
+            ],
+            text={"format": {"type": "json_object"}}
+        )
+
     text = response.output_text
     try:
-        data = json.loads(text)
+        data = orjson.loads(text)
     except Exception:
         raise ValueError("Could not parse GPT output")
 
+    return fields_from_gpt(hanzi, data)
+
+
+async def stream_fields_batch(hanzis):
+    """Generate the note fields for several words with a single streamed request.
+
+    Fields are yielded as soon as each word's item has been streamed, so TTS
+    for the first words starts while the rest are still being generated.
+    Raises StreamFailedError if OpenAI reports a failure mid-stream, so the
+    caller retries the remaining words, and ValueError if the response is
+    cut short, can't be parsed or doesn't line up with ``hanzis``, so the
+    caller can fall back to one request per word.
+    """
+    words = orjson.dumps(list(hanzis)).decode()
+    stream = await OPENAI_CLIENT.responses.create(
+        model=MODEL,
+        input=[
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": words},
+        ],
+        text={"format": {"type": "json_object"}},
+        stream=True,
+    )
+
+    text = ""
+    done = 0
+    async with stream:
+        async for event in stream:
+            if event.type == "response.failed":
+                raise StreamFailedError(f"Response failed: {event.response.error}")
+            if event.type == "error":
+                raise StreamFailedError(f"Stream error: {event.message}")
+            if event.type == "response.incomplete":
+                # e.g. max_output_tokens or content_filter; retrying the same
+                # batch would stop in the same place.
+                raise ValueError(f"Response incomplete: {event.response.incomplete_details}")
+            if event.type != "response.output_text.delta":
+                continue
+            text += event.delta
+            # An item can only have completed if a string was just closed.
+            if '"' not in event.delta:
+                continue
+            for item in parse_items(text, partial=True)[done:]:
+                yield fields_from_item(hanzis, done, item)
+                done += 1
+
+    items = parse_items(text)
+    if len(items) != len(hanzis):
+        raise ValueError("GPT output does not match the requested words")
+    for item in items[done:]:
+        yield fields_from_item(hanzis, done, item)
+        done += 1
+
+
+BATCH_ITEM_KEYS = {"word", "english", "pinyin", "sentence", "translation", "cloze"}
+
+
+def parse_items(text, partial=False):
+    """Return the items of a batch response.
+
+    With ``partial``, ``text`` may be an unfinished stream and only the
+    leading items whose fields have all been received are returned.
+    """
+    try:
+        if not partial:
+            return orjson.loads(text)["items"]
+        items = jiter.from_json(text.encode(), partial_mode=True).get("items", [])
+        return list(itertools.takewhile(lambda item: BATCH_ITEM_KEYS <= item.keys(), items))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        raise ValueError("Could not parse GPT output")
+
+
+def fields_from_item(hanzis, index, item):
+    try:
+        if index >= len(hanzis) or item["word"] != hanzis[index]:
+            raise ValueError("GPT output does not match the requested words")
+        return fields_from_gpt(hanzis[index], item)
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError("Could not parse GPT output")
+
+
+def fields_from_gpt(hanzi, data):
     return {
         "Hanzi": hanzi,
         "English": data["english"],
@@ -68,60 +348,215 @@ Respond in JSON like this:
     }
 
 
+def open_cache(path=CACHE_FILE):
+    """Open the response cache, or return None if it can't be used."""
+    cache = None
+    try:
+        cache = sqlite3.connect(path)
+        cache.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, json TEXT)")
+    except sqlite3.Error as e:
+        log.warning("Could not open the cache at %s, continuing without it: %s", path, e)
+        if cache is not None:
+            cache.close()
+        return None
+    return cache
+
+
+def cache_key(hanzi):
+    return hashlib.sha1(f"{MODEL}|{PROMPT_VERSION}|{hanzi}".encode()).hexdigest()
 
-def process_word(hanzi, output_writer):
+
+# The cache is only an optimization: a failed read is treated as a miss and a
+# failed write is skipped, so a locked or corrupt cache never fails a word.
+
+def cache_get_many(cache, hanzis):
+    """Return a dict of the cached note fields for those ``hanzis`` that hit."""
+    if cache is None:
+        return {}
+    hits = {}
+    for hanzi in hanzis:
+        try:
+            row = cache.execute("SELECT json FROM cache WHERE key=?", (cache_key(hanzi),)).fetchone()
+            if row:
+                hits[hanzi] = orjson.loads(row[0])
+        except (sqlite3.Error, orjson.JSONDecodeError) as e:
+            log.warning("Could not read cached fields for %s: %s", hanzi, e)
+    return hits
+
+
+def cache_put_many(cache, fields_list):
+    """Store generated note fields, committing them in one transaction."""
+    if cache is None or not fields_list:
+        return
     try:
-        fields = generate_fields_from_hanzi(hanzi)
-
-        os.makedirs('output/audio', exist_ok=True)
-        audio_word_path = f"{'output/audio/'}{hanzi}_word.mp3"
-        audio_sent_path = f"{'output/audio/'}{hanzi}_sentence.mp3"
-
-        synthesize_audio(fields["Hanzi"], audio_word_path)
-        synthesize_audio(fields["Sentence"], audio_sent_path)
-
-        fields["Audio (Word)"] = f"[sound:{os.path.basename(audio_word_path)}]"
-        fields["Audio (Sentence)"] = f"[sound:{os.path.basename(audio_sent_path)}]"
-
-        output_writer.writerow(fields)
-    except Exception as e:
-        print(f"Error processing {hanzi}: {e}")
-
-def save_progress(writer, rows, output_file):
-    """Save the current progress to the CSV file"""
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = [
-            "Hanzi", "English", "Pinyin", "Sentence",
-            "Sentence (Translation)", "Sentence (Cloze)",
-            "Audio (Word)", "Audio (Sentence)"
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+        with cache:
+            cache.executemany(
+                "INSERT OR REPLACE INTO cache (key, json) VALUES (?, ?)",
+                [(cache_key(fields["Hanzi"]), orjson.dumps(fields).decode()) for fields in fields_list],
+            )
+    except sqlite3.Error as e:
+        log.warning("Could not cache fields for %d words: %s", len(fields_list), e)
+
+
+def cache_invalidate(cache, hanzis):
+    if cache is None:
+        return
+    try:
+        with cache:
+            cache.executemany("DELETE FROM cache WHERE key=?", [(cache_key(h),) for h in hanzis])
+    except sqlite3.Error as e:
+        log.warning("Could not invalidate cached fields: %s", e)
+
+
+async def run_cache(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(CACHE_IO, func, *args)
+
+
+def batched(iterable, n):
+    # itertools.batched is only available from Python 3.12.
+    it = iter(iterable)
+    while batch := tuple(itertools.islice(it, n)):
+        yield batch
+
+
+async def generate_individually(batch, word_audio, tts_queue, results, openai_limit, generated):
+    for hanzi in batch:
+        try:
+            fields = await generate_fields_from_hanzi(hanzi, openai_limit)
+        except Exception as e:
+            await results.put((hanzi, e))
+        else:
+            generated.append(dict(fields))
+            await tts_queue.put((fields, word_audio.pop(hanzi)))
+
+
+async def generate_worker(batch_queue, tts_queue, results, cache, openai_limit, tts_limit):
+    """Stage A: generate note fields and hand them to the TTS stage.
+
+    While one batch is being voiced by the TTS workers, the next batches are
+    already being generated here. Words found in ``cache`` skip OpenAI, and
+    if a batch response can't be used its words are retried one request at
+    a time. Newly generated fields are cached in one commit per batch.
+
+    The word audio only needs the word itself, so it is started as soon as
+    the batch is picked up and its task is passed along with the fields.
+    """
+    while True:
+        batch = await batch_queue.get()
+        word_audio = {
+            hanzi: asyncio.create_task(synthesize_to_file(hanzi, audio_paths(hanzi)[0], tts_limit))
+            for hanzi in batch
+        }
+        # Words are removed from pending once their fields are handed off, so
+        # a retry after a dropped stream only asks for the rest of the batch.
+        pending = []
+        # Copies of the new fields, taken before the TTS stage adds to them.
+        generated = []
+        try:
+            cached = await run_cache(cache_get_many, cache, batch)
+            for hanzi in batch:
+                if hanzi in cached:
+                    log.debug("Cache hit: %s", hanzi)
+                    await tts_queue.put((cached[hanzi], word_audio.pop(hanzi)))
+                else:
+                    pending.append(hanzi)
+            if not pending:
+                continue
+
+            try:
+                async for attempt in AsyncRetrying(**RETRY_POLICY):
+                    with attempt:
+                        async with openai_limit:
+                            async for fields in stream_fields_batch(tuple(pending)):
+                                generated.append(dict(fields))
+                                await tts_queue.put((fields, word_audio.pop(fields["Hanzi"])))
+                                # Only once handed off, so the error paths
+                                # below still report it if anything failed.
+                                pending.remove(fields["Hanzi"])
+            except ValueError as e:
+                log.warning("Batch of %d words failed (%s), retrying individually...", len(pending), e)
+                await generate_individually(pending, word_audio, tts_queue, results, openai_limit, generated)
+            except Exception as e:
+                for hanzi in pending:
+                    await results.put((hanzi, e))
+        finally:
+            # Audio for words that failed generation is no longer needed.
+            for task in word_audio.values():
+                task.cancel()
+            await asyncio.gather(*word_audio.values(), return_exceptions=True)
+            await run_cache(cache_put_many, cache, generated)
+
+
+async def tts_worker(tts_queue, results, tts_limit):
+    """Stage B: synthesize the sentence audio and wait for the word audio.
+
+    Every word ends up on ``results`` as a ``(hanzi, fields)`` tuple, where
+    ``fields`` is the raised exception if processing failed.
+    """
+    while True:
+        fields, word_audio = await tts_queue.get()
+        hanzi = fields["Hanzi"]
+        try:
+            audio_word_path, audio_sent_path = audio_paths(hanzi)
+
+            await asyncio.gather(
+                word_audio,
+                synthesize_to_file(fields["Sentence"], audio_sent_path, tts_limit),
+            )
+
+            fields["Audio (Word)"] = f"[sound:{os.path.basename(audio_word_path)}]"
+            fields["Audio (Sentence)"] = f"[sound:{os.path.basename(audio_sent_path)}]"
+        except Exception as e:
+            await results.put((hanzi, e))
+        else:
+            await results.put((hanzi, fields))
+
+async def next_result(results, workers):
+    """Wait for the next result, raising if a worker died instead.
 
-def main():
+    Workers run forever, so one finishing means it crashed and the words it
+    held would otherwise never produce a result.
+    """
+    get_result = asyncio.ensure_future(results.get())
+    done, _ = await asyncio.wait([get_result, *workers], return_when=asyncio.FIRST_COMPLETED)
+    if get_result in done:
+        return get_result.result()
+    get_result.cancel()
+    for worker in done:
+        worker.result()
+    raise RuntimeError("A pipeline worker stopped unexpectedly")
+
+
+async def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Process Hanzi words and generate Anki cards.')
     parser.add_argument('input_file', nargs='?', help='Input file containing Hanzi words (one per line)')
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor write the OpenAI response cache')
+    parser.add_argument('--invalidate', action='store_true', help='Drop cached OpenAI responses for the input words before processing')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every API request and cache hit')
+    parser.add_argument('--openai-concurrency', type=int, default=OPENAI_CONCURRENCY, help='Maximum OpenAI requests in flight (default: %(default)s)')
+    parser.add_argument('--tts-concurrency', type=int, default=TTS_CONCURRENCY, help='Maximum TTS requests in flight (default: %(default)s)')
     args = parser.parse_args()
+    if args.openai_concurrency < 1 or args.tts_concurrency < 1:
+        parser.error("concurrency must be at least 1")
+
+    # Only this script's logger goes below WARNING; httpx would otherwise log
+    # every OpenAI request at INFO.
+    logging.basicConfig(level=logging.WARNING)
+    log.setLevel(logging.DEBUG if args.verbose else logging.INFO)
 
     output_file = "output/notes.csv"
     os.makedirs("output", exist_ok=True)
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
 
     fieldnames = [
         "Hanzi", "English", "Pinyin", "Sentence",
         "Sentence (Translation)", "Sentence (Cloze)",
         "Audio (Word)", "Audio (Sentence)"
     ]
-    
-    # Initialize CSV file with headers
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
 
-    processed_rows = []
-    failed_words = []
     row_count = 0
+    failed_words = []
 
     # Get words from input file or interactive mode
     if args.input_file:
@@ -130,6 +565,9 @@ def main():
             return
         with open(args.input_file, encoding="utf-8") as f:
             words = [line.strip() for line in f if line.strip()]
+        if not words:
+            print(f"No words found in '{args.input_file}'. Exiting.")
+            return
     else:
         print("No input file provided. Entering interactive mode.")
         print("Enter Hanzi words one at a time. Press Enter twice to finish.")
@@ -146,50 +584,80 @@ def main():
 
     # Remove duplicates while preserving order
     original_count = len(words)
-    seen = set()
-    words = [x for x in words if not (x in seen or seen.add(x))]
+    words = list(dict.fromkeys(words))
     
     if original_count > len(words):
         print(f"\nRemoved {original_count - len(words)} duplicate words.")
 
-    print(f"\nProcessing {len(words)} unique words...")
-    for hanzi in tqdm(words, desc="Processing words", unit="word"):
-        try:
-            fields = generate_fields_from_hanzi(hanzi)
+    # With --no-cache the cache is only opened if --invalidate needs it.
+    cache = None
+    if args.invalidate or not args.no_cache:
+        cache = await run_cache(open_cache)
+    if args.invalidate:
+        await run_cache(cache_invalidate, cache, words)
+    if args.no_cache and cache is not None:
+        await run_cache(cache.close)
+        cache = None
 
-            os.makedirs('output/audio', exist_ok=True)
-            audio_word_path = f"{'output/audio/'}{hanzi}_word.mp3"
-            audio_sent_path = f"{'output/audio/'}{hanzi}_sentence.mp3"
-
-            synthesize_audio(fields["Hanzi"], audio_word_path)
-            synthesize_audio(fields["Sentence"], audio_sent_path)
-
-            fields["Audio (Word)"] = f"[sound:{os.path.basename(audio_word_path)}]"
-            fields["Audio (Sentence)"] = f"[sound:{os.path.basename(audio_sent_path)}]"
-
-            processed_rows.append(fields)
-            row_count += 1
-
-            # Save progress every 10 rows
-            if row_count % 10 == 0:
-                tqdm.write(f"Saving progress after {row_count} words...")
-                save_progress(csv.DictWriter(open(output_file, "w", newline="", encoding="utf-8"), fieldnames=fieldnames), processed_rows, output_file)
+    print(f"\nProcessing {len(words)} unique words...")
+    batch_queue = asyncio.Queue()
+    for batch in batched(words, BATCH_SIZE):
+        batch_queue.put_nowait(batch)
+    tts_queue = asyncio.Queue(maxsize=16)
+    results = asyncio.Queue()
+    openai_limit = AdaptiveLimit("OpenAI", args.openai_concurrency)
+    tts_limit = AdaptiveLimit("TTS", args.tts_concurrency)
+
+    workers = [
+        asyncio.create_task(generate_worker(batch_queue, tts_queue, results, cache, openai_limit, tts_limit))
+        for _ in range(args.openai_concurrency)
+    ] + [
+        asyncio.create_task(tts_worker(tts_queue, results, tts_limit))
+        for _ in range(args.tts_concurrency)
+    ]
 
-        except Exception as e:
-            tqdm.write(f"Error processing {hanzi}: {e}")
-            failed_words.append(hanzi)
-            continue
+    # Words finish out of order; rows are written in input order by flushing
+    # the finished prefix of the word list as it grows.
+    word_index = {hanzi: i for i, hanzi in enumerate(words)}
+    finished = [None] * len(words)
+    next_to_write = 0
 
-    # Final save of all processed rows
-    if processed_rows:
-        save_progress(csv.DictWriter(open(output_file, "w", newline="", encoding="utf-8"), fieldnames=fieldnames), processed_rows, output_file)
+    # The CSV is opened once, only when there is work to do, so an aborted
+    # start never replaces the previous notes with a header-only file. Log
+    # records are routed through tqdm so they don't break the progress bar.
+    with open(output_file, "w", newline="", encoding="utf-8") as csvfile, logging_redirect_tqdm():
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        try:
+            for _ in tqdm(range(len(words)), desc="Processing words", unit="word"):
+                hanzi, fields = await next_result(results, workers)
+                if isinstance(fields, Exception):
+                    tqdm.write(f"Error processing {hanzi}: {fields}")
+                    failed_words.append(hanzi)
+                finished[word_index[hanzi]] = fields
+
+                start = next_to_write
+                while next_to_write < len(words) and finished[next_to_write] is not None:
+                    row = finished[next_to_write]
+                    if not isinstance(row, Exception):
+                        writer.writerow(row)
+                        row_count += 1
+                    next_to_write += 1
+                if next_to_write > start:
+                    csvfile.flush()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if cache is not None:
+                await run_cache(cache.close)
 
     # Print summary
     print(f"\nProcessing complete!")
-    print(f"Successfully processed: {len(processed_rows)} words")
+    print(f"Successfully processed: {row_count} words")
     if failed_words:
         print(f"Failed to process: {len(failed_words)} words")
         print("Failed words:", ", ".join(failed_words))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file